@@ -1,18 +1,36 @@
+import asyncio
+import hmac
+import json
 import os
+import re
+import secrets
 import sqlite3
 import threading
 import time
+from collections import defaultdict
 from datetime import date, datetime
 from functools import wraps
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from flask import Flask, flash, g, redirect, render_template, request, session, url_for
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
 from werkzeug.security import check_password_hash, generate_password_hash
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "data", "ledger.db")
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 DEFAULT_PASSWORD = "P@ssw0rd"
+APP_PASSWORD = os.getenv("APP_PASSWORD", DEFAULT_PASSWORD)
+APP_PASSWORD_HASH = os.getenv("APP_PASSWORD_HASH")
 DEFAULT_TELEGRAM_POLL_INTERVAL = 5
 ALLOWED_CATEGORIES = [
     "餐饮",
@@ -30,18 +48,82 @@ ALLOWED_CATEGORIES = [
     "理财收益",
     "其他",
 ]
+ALLOWED_CATEGORIES_SET = frozenset(ALLOWED_CATEGORIES)
+
+DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+MONTH_RE = re.compile(r"^\d{4}-(\d{2})$")
+DAYS_IN_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+SQL_GET_CONFIG = "SELECT value FROM app_config WHERE key = ?"
+SQL_SET_CONFIG = """
+    INSERT INTO app_config(key, value)
+    VALUES(?, ?)
+    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+"""
+SQL_INSERT_TX = """
+    INSERT INTO transactions(type, amount, category, note, happened_on, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_RECENT_TX = """
+    SELECT id, type, amount, category, note, happened_on, created_at
+    FROM transactions
+    ORDER BY happened_on DESC, id DESC
+    LIMIT 100
+"""
+SQL_TOTALS_ALL = """
+    SELECT
+      COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) AS income_total,
+      COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) AS expense_total
+    FROM transactions
+"""
+SQL_AVAILABLE_MONTHS = """
+    SELECT DISTINCT substr(happened_on, 1, 7) AS month
+    FROM transactions
+    WHERE length(happened_on) >= 7
+    ORDER BY month DESC
+"""
+SQL_MONTH_TX = """
+    SELECT id, type, amount, category, note, happened_on
+    FROM transactions
+    WHERE happened_on >= ? AND happened_on < ?
+    ORDER BY happened_on DESC, id DESC
+"""
+SQL_GET_TX = """
+    SELECT id, type, amount, category, note, happened_on
+    FROM transactions
+    WHERE id = ?
+"""
+SQL_UPDATE_TX = """
+    UPDATE transactions
+    SET type = ?, amount = ?, category = ?, note = ?, happened_on = ?
+    WHERE id = ?
+"""
+SQL_DELETE_TX = "DELETE FROM transactions WHERE id = ?"
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "change-this-in-production")
+app.jinja_env.globals["categories"] = tuple(ALLOWED_CATEGORIES)
 
 telegram_thread = None
 telegram_lock = threading.Lock()
 
+config_cache: dict[str, str | None] = {}
+config_cache_lock = threading.Lock()
+
 def get_db():
     if "db" not in g:
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        g.db = sqlite3.connect(DB_PATH)
+        g.db = sqlite3.connect(DB_PATH, cached_statements=128, isolation_level=None)
         g.db.row_factory = sqlite3.Row
+        g.db.executescript(
+            """
+            PRAGMA synchronous = NORMAL;
+            PRAGMA foreign_keys = ON;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 134217728;
+            PRAGMA cache_size = -20000;
+            PRAGMA busy_timeout = 5000;
+            """
+        )
     return g.db
 
 
@@ -54,7 +136,9 @@ def close_db(exc):
 
 def init_db():
     db = get_db()
-    db.execute(
+    # WAL 为持久化设置，进程启动时执行一次即可。
+    db.execute("PRAGMA journal_mode = WAL")
+    db.executescript(
         """
         CREATE TABLE IF NOT EXISTS transactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,59 +148,126 @@ def init_db():
             note TEXT,
             happened_on TEXT NOT NULL,
             created_at TEXT NOT NULL
-        )
-        """
-    )
-    db.execute(
-        """
+        );
         CREATE TABLE IF NOT EXISTS app_config (
             key TEXT PRIMARY KEY,
             value TEXT NOT NULL
-        )
+        );
+        CREATE INDEX IF NOT EXISTS idx_tx_happened_id ON transactions(happened_on DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_tx_type_happened ON transactions(type, happened_on);
         """
     )
-    db.commit()
+    db.execute(
+        "INSERT OR IGNORE INTO app_config(key, value) VALUES('telegram_poll_interval', ?)",
+        (str(DEFAULT_TELEGRAM_POLL_INTERVAL),),
+    )
 
 
 def get_config(key: str, default: str = "") -> str:
+    with config_cache_lock:
+        if key in config_cache:
+            value = config_cache[key]
+            return value if value is not None else default
     db = get_db()
-    row = db.execute("SELECT value FROM app_config WHERE key = ?", (key,)).fetchone()
-    return row["value"] if row else default
+    row = db.execute(SQL_GET_CONFIG, (key,)).fetchone()
+    value = row["value"] if row else None
+    with config_cache_lock:
+        config_cache[key] = value
+    return value if value is not None else default
 
 
 def set_config(key: str, value: str) -> None:
     db = get_db()
-    db.execute(
-        """
-        INSERT INTO app_config(key, value)
-        VALUES(?, ?)
-        ON CONFLICT(key) DO UPDATE SET value = excluded.value
-        """,
-        (key, value),
-    )
-    db.commit()
+    db.execute(SQL_SET_CONFIG, (key, value))
+    with config_cache_lock:
+        config_cache[key] = value
 
 
 def add_transaction_record(
     tx_type: str, amount: float, category: str, note: str, happened_on: str
 ) -> None:
     db = get_db()
-    db.execute(
-        """
-        INSERT INTO transactions(type, amount, category, note, happened_on, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (tx_type, amount, category, note, happened_on, datetime.now().isoformat()),
-    )
-    db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute(
+            SQL_INSERT_TX,
+            (tx_type, amount, category, note, happened_on, datetime.now().isoformat()),
+        )
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+
+
+def is_valid_date(value: str) -> bool:
+    match = DATE_RE.match(value)
+    if not match:
+        return False
+    month = int(match.group(2))
+    day = int(match.group(3))
+    if not 1 <= month <= 12 or not 1 <= day <= DAYS_IN_MONTH[month - 1]:
+        return False
+    if month == 2 and day == 29:
+        year = int(match.group(1))
+        return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    return True
 
 
 def is_password_valid(raw_password: str) -> bool:
-    env_password = os.getenv("APP_PASSWORD", DEFAULT_PASSWORD)
-    env_password_hash = os.getenv("APP_PASSWORD_HASH")
-    if env_password_hash:
-        return check_password_hash(env_password_hash, raw_password)
-    return raw_password == env_password
+    if APP_PASSWORD_HASH:
+        return check_password_hash(APP_PASSWORD_HASH, raw_password)
+    return hmac.compare_digest(raw_password.encode(), APP_PASSWORD.encode())
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid="", new=False):
+        def on_update(updated):
+            updated.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class InMemorySessionInterface(SessionInterface):
+    """服务端会话：cookie 只携带随机 sid，免去每个请求的 HMAC 校验。"""
+
+    def __init__(self):
+        self.sessions: dict[str, dict] = {}
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.sessions.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(16), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.sessions.pop(session.sid, None)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified or session.new:
+            self.sessions[session.sid] = dict(session)
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+app.session_interface = InMemorySessionInterface()
 
 
 def login_required(view):
@@ -151,23 +302,9 @@ def logout():
 def index():
     db = get_db()
 
-    rows = db.execute(
-        """
-        SELECT id, type, amount, category, note, happened_on, created_at
-        FROM transactions
-        ORDER BY date(happened_on) DESC, id DESC
-        LIMIT 100
-        """,
-    ).fetchall()
-
-    totals = db.execute(
-        """
-        SELECT
-          COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) AS income_total,
-          COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) AS expense_total
-        FROM transactions
-        """
-    ).fetchone()
+    rows = db.execute(SQL_RECENT_TX)
+
+    totals = db.execute(SQL_TOTALS_ALL).fetchone()
     income_total = float(totals["income_total"] or 0)
     expense_total = float(totals["expense_total"] or 0)
     balance = income_total - expense_total
@@ -178,8 +315,7 @@ def index():
         income_total=income_total,
         expense_total=expense_total,
         balance=balance,
-        today=date.today().isoformat(),
-        categories=ALLOWED_CATEGORIES,
+        today=time.strftime("%Y-%m-%d"),
     )
 
 
@@ -190,10 +326,16 @@ def settings():
         enabled = "1" if request.form.get("telegram_enabled") == "on" else "0"
         bot_token = request.form.get("telegram_bot_token", "").strip()
         allowed_chat_id = request.form.get("telegram_allowed_chat_id", "").strip()
+        webhook_url = request.form.get("telegram_webhook_url", "").strip()
 
         set_config("telegram_enabled", enabled)
         set_config("telegram_bot_token", bot_token)
         set_config("telegram_allowed_chat_id", allowed_chat_id)
+        if not sync_telegram_webhook(bot_token, enabled == "1", webhook_url):
+            # 注册失败时不保存地址，否则轮询停摆而 webhook 也没在收消息。
+            webhook_url = ""
+            flash("Webhook 注册失败，已回退为后台轮询。")
+        set_config("telegram_webhook_url", webhook_url)
         flash("配置已保存。")
         return redirect(url_for("settings"))
 
@@ -202,7 +344,7 @@ def settings():
         telegram_enabled=get_config("telegram_enabled", "0") == "1",
         telegram_bot_token=get_config("telegram_bot_token", ""),
         telegram_allowed_chat_id=get_config("telegram_allowed_chat_id", ""),
-        categories=ALLOWED_CATEGORIES,
+        telegram_webhook_url=get_config("telegram_webhook_url", ""),
     )
 
 
@@ -212,101 +354,73 @@ def monthly_report():
     db = get_db()
     current_month = date.today().strftime("%Y-%m")
     selected_month = request.args.get("month", current_month).strip()
-    try:
-        datetime.strptime(selected_month, "%Y-%m")
-    except ValueError:
+    match = MONTH_RE.match(selected_month)
+    if not match or not 1 <= int(match.group(1)) <= 12:
         selected_month = current_month
 
-    month_rows = db.execute(
-        """
-        SELECT DISTINCT substr(happened_on, 1, 7) AS month
-        FROM transactions
-        WHERE length(happened_on) >= 7
-        ORDER BY month DESC
-        """
-    ).fetchall()
+    # 半开区间 [月初, 下月初) 可走索引，substr() 会让过滤退化为全表扫描。
+    year, month = (int(part) for part in selected_month.split("-"))
+    month_start = f"{selected_month}-01"
+    if month == 12:
+        next_month_start = f"{year + 1}-01-01"
+    else:
+        next_month_start = f"{year}-{month + 1:02d}-01"
+
+    month_rows = db.execute(SQL_AVAILABLE_MONTHS).fetchall()
     available_months = [r["month"] for r in month_rows if r["month"]]
     if current_month not in available_months:
         available_months.insert(0, current_month)
     if selected_month not in available_months:
         available_months.insert(0, selected_month)
 
-    totals = db.execute(
-        """
-        SELECT
-          COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) AS income_total,
-          COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) AS expense_total
-        FROM transactions
-        WHERE substr(happened_on, 1, 7) = ?
-        """,
-        (selected_month,),
-    ).fetchone()
-    income_total = float(totals["income_total"] or 0)
-    expense_total = float(totals["expense_total"] or 0)
+    tx_rows = db.execute(SQL_MONTH_TX, (month_start, next_month_start))
+
+    income_total = 0.0
+    expense_total = 0.0
+    expense_by_category = defaultdict(float)
+    income_by_category = defaultdict(float)
+    expense_rows = []
+    income_rows = []
+    for row in tx_rows:
+        amount = float(row["amount"] or 0)
+        entry = {
+            "happened_on": row["happened_on"],
+            "category": row["category"],
+            "note": row["note"],
+            "amount_fmt": f"{amount:.2f}",
+        }
+        if row["type"] == "income":
+            income_total += amount
+            income_by_category[row["category"]] += amount
+            income_rows.append(entry)
+        else:
+            expense_total += amount
+            expense_by_category[row["category"]] += amount
+            expense_rows.append(entry)
     balance = income_total - expense_total
 
-    category_rows = db.execute(
-        """
-        SELECT category, SUM(amount) AS total
-        FROM transactions
-        WHERE type = 'expense' AND substr(happened_on, 1, 7) = ?
-        GROUP BY category
-        ORDER BY total DESC, category ASC
-        """,
-        (selected_month,),
-    ).fetchall()
-    category_expenses = []
-    for row in category_rows:
-        total = float(row["total"] or 0)
-        ratio = (total / expense_total * 100.0) if expense_total > 0 else 0.0
-        category_expenses.append(
-            {
-                "category": row["category"],
-                "total": total,
-                "ratio": ratio,
-            }
+    expense_scale = 100.0 / expense_total if expense_total > 0 else 0.0
+    income_scale = 100.0 / income_total if income_total > 0 else 0.0
+    category_expenses = [
+        {
+            "category": category,
+            "total_fmt": f"{total:.2f}",
+            "ratio_fmt": f"{total * expense_scale:.1f}",
+        }
+        for category, total in sorted(
+            expense_by_category.items(), key=lambda item: (-item[1], item[0])
         )
-
-    income_category_rows = db.execute(
-        """
-        SELECT category, SUM(amount) AS total
-        FROM transactions
-        WHERE type = 'income' AND substr(happened_on, 1, 7) = ?
-        GROUP BY category
-        ORDER BY total DESC, category ASC
-        """,
-        (selected_month,),
-    ).fetchall()
-    category_incomes = []
-    for row in income_category_rows:
-        total = float(row["total"] or 0)
-        ratio = (total / income_total * 100.0) if income_total > 0 else 0.0
-        category_incomes.append(
-            {
-                "category": row["category"],
-                "total": total,
-                "ratio": ratio,
-            }
+    ]
+    category_incomes = [
+        {
+            "category": category,
+            "total_fmt": f"{total:.2f}",
+            "ratio_fmt": f"{total * income_scale:.1f}",
+        }
+        for category, total in sorted(
+            income_by_category.items(), key=lambda item: (-item[1], item[0])
         )
-
-    expense_rows = db.execute(
-        """
-        SELECT id, happened_on, category, amount, note
-        FROM transactions
-        WHERE type = 'expense' AND substr(happened_on, 1, 7) = ?
-        ORDER BY date(happened_on) DESC, id DESC
-        """,
-        (selected_month,),
-    ).fetchall()
-    income_rows = db.execute(
-        """
-        SELECT id, happened_on, category, amount, note
-        FROM transactions
-        WHERE type = 'income' AND substr(happened_on, 1, 7) = ?
-        ORDER BY date(happened_on) DESC, id DESC
-        """,
-        (selected_month,),
-    ).fetchall()
+    ]
 
     return render_template(
         "monthly_report.html",
@@ -346,12 +460,10 @@ def add_transaction():
     if not category:
         flash("分类不能为空。")
         return redirect(url_for("index"))
-    if category not in ALLOWED_CATEGORIES:
+    if category not in ALLOWED_CATEGORIES_SET:
         flash("分类不在可选范围内。")
         return redirect(url_for("index"))
-    try:
-        datetime.strptime(happened_on, "%Y-%m-%d")
-    except ValueError:
+    if not is_valid_date(happened_on):
         flash("日期格式错误。")
         return redirect(url_for("index"))
 
@@ -363,8 +475,7 @@ def add_transaction():
 @login_required
 def delete_transaction(tx_id: int):
     db = get_db()
-    db.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
-    db.commit()
+    db.execute(SQL_DELETE_TX, (tx_id,))
     return redirect(url_for("index"))
 
 
@@ -372,14 +483,7 @@ def delete_transaction(tx_id: int):
 @login_required
 def edit_transaction(tx_id: int):
     db = get_db()
-    row = db.execute(
-        """
-        SELECT id, type, amount, category, note, happened_on
-        FROM transactions
-        WHERE id = ?
-        """,
-        (tx_id,),
-    ).fetchone()
+    row = db.execute(SQL_GET_TX, (tx_id,)).fetchone()
     if not row:
         flash("记录不存在。")
         return redirect(url_for("index"))
@@ -403,31 +507,20 @@ def edit_transaction(tx_id: int):
         if amount < 0:
             flash("金额不能小于 0。")
             return redirect(url_for("edit_transaction", tx_id=tx_id))
-        if category not in ALLOWED_CATEGORIES:
+        if category not in ALLOWED_CATEGORIES_SET:
             flash("分类不在可选范围内。")
             return redirect(url_for("edit_transaction", tx_id=tx_id))
-        try:
-            datetime.strptime(happened_on, "%Y-%m-%d")
-        except ValueError:
+        if not is_valid_date(happened_on):
             flash("日期格式错误。")
             return redirect(url_for("edit_transaction", tx_id=tx_id))
 
         db.execute(
-            """
-            UPDATE transactions
-            SET type = ?, amount = ?, category = ?, note = ?, happened_on = ?
-            WHERE id = ?
-            """,
+            SQL_UPDATE_TX,
             (tx_type, amount, category, note, happened_on, tx_id),
         )
-        db.commit()
         return redirect(url_for("index"))
 
-    return render_template(
-        "edit_transaction.html",
-        tx=row,
-        categories=ALLOWED_CATEGORIES,
-    )
+    return render_template("edit_transaction.html", tx=row)
 
 
 @app.cli.command("hash-password")
@@ -436,15 +529,23 @@ def hash_password():
     print(generate_password_hash(password))
 
 
+TELEGRAM_TYPE_MAP = {
+    "expense": "expense",
+    "income": "income",
+    "add_expense": "expense",
+    "add_income": "income",
+    "支出": "expense",
+    "收入": "income",
+}
+
+
 def parse_telegram_transaction(text: str):
     line = (text or "").strip()
     if not line:
         return None, "消息为空，请发送记账命令。"
 
-    normalized = line
-    if normalized.startswith("/"):
-        normalized = normalized[1:]
-    parts = normalized.split()
+    normalized = line[1:] if line.startswith("/") else line
+    parts = normalized.split(maxsplit=3)
     if not parts:
         return None, "消息为空，请发送记账命令。"
 
@@ -454,36 +555,32 @@ def parse_telegram_transaction(text: str):
     if len(parts) < 3:
         return None, "格式错误。示例：/expense 32.5 餐饮 午饭"
 
-    type_map = {
-        "expense": "expense",
-        "income": "income",
-        "add_expense": "expense",
-        "add_income": "income",
-        "支出": "expense",
-        "收入": "income",
-    }
-
     if cmd == "add":
         if len(parts) < 4:
             return None, "格式错误。示例：/add 支出 32.5 餐饮 午饭"
         cmd = parts[1].lower()
-        parts = parts[1:]
-
-    tx_type = type_map.get(cmd)
+        amount_raw = parts[2]
+        rest = parts[3].split(maxsplit=1)
+        category = rest[0]
+        note = rest[1].strip() if len(rest) > 1 else ""
+    else:
+        amount_raw = parts[1]
+        category = parts[2]
+        note = parts[3].strip() if len(parts) > 3 else ""
+
+    tx_type = TELEGRAM_TYPE_MAP.get(cmd)
     if not tx_type:
         return None, "不支持的命令。请使用 /expense 或 /income。"
 
     try:
-        amount = float(parts[1])
+        amount = float(amount_raw)
     except ValueError:
         return None, "金额必须是数字。"
     if amount < 0:
         return None, "金额不能小于 0。"
 
-    category = parts[2]
-    if category not in ALLOWED_CATEGORIES:
+    if category not in ALLOWED_CATEGORIES_SET:
         return None, f"分类无效。可用分类：{', '.join(ALLOWED_CATEGORIES)}"
-    note = " ".join(parts[3:]).strip() if len(parts) > 3 else ""
 
     return {
         "type": tx_type,
@@ -494,14 +591,29 @@ def parse_telegram_transaction(text: str):
     }, ""
 
 
-def telegram_api_get(token: str, method: str, params: dict):
-    url = f"https://api.telegram.org/bot{token}/{method}"
-    return requests.get(url, params=params, timeout=30)
+telegram_session = requests.Session()
+telegram_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+telegram_api_base = ("", "")
+
+
+def json_loads(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def telegram_api_url(token: str, method: str) -> str:
+    global telegram_api_base
+    cached_token, base = telegram_api_base
+    if token != cached_token:
+        base = f"https://api.telegram.org/bot{token}"
+        telegram_api_base = (token, base)
+    return f"{base}/{method}"
 
 
 def telegram_api_post(token: str, method: str, payload: dict):
-    url = f"https://api.telegram.org/bot{token}/{method}"
-    return requests.post(url, json=payload, timeout=30)
+    return telegram_session.post(telegram_api_url(token, method), json=payload, timeout=30)
 
 
 def send_telegram_message(token: str, chat_id: int, text: str):
@@ -559,52 +671,129 @@ def handle_telegram_message(token: str, message: dict):
     )
 
 
-def telegram_poll_loop():
+def sync_telegram_webhook(token: str, enabled: bool, webhook_url: str) -> bool:
+    if not token:
+        return True
+    if enabled and webhook_url:
+        secret = get_config("telegram_webhook_secret", "")
+        if not secret:
+            secret = secrets.token_urlsafe(32)
+            set_config("telegram_webhook_secret", secret)
+        try:
+            resp = telegram_api_post(
+                token,
+                "setWebhook",
+                {
+                    "url": f"{webhook_url.rstrip('/')}/telegram/webhook/{secret}",
+                    "allowed_updates": ["message"],
+                },
+            )
+            if resp.json().get("ok"):
+                return True
+        except (requests.RequestException, ValueError):
+            pass
+    # 未启用 webhook 或注册失败：清掉 Telegram 侧的 webhook，轮询才收得到消息。
+    try:
+        telegram_api_post(token, "deleteWebhook", {})
+    except requests.RequestException:
+        pass
+    return not (enabled and webhook_url)
+
+
+@app.post("/telegram/webhook/<secret>")
+def telegram_webhook(secret: str):
+    expected = get_config("telegram_webhook_secret", "")
+    if not expected or not secrets.compare_digest(secret, expected):
+        return "", 403
+    if get_config("telegram_enabled", "0") != "1":
+        return "", 200
+    token = get_config("telegram_bot_token", "").strip()
+    if not token:
+        return "", 200
+    try:
+        update = json_loads(request.get_data())
+    except ValueError:
+        update = None
+    if not isinstance(update, dict):
+        update = {}
+    message = update.get("message")
+    if message:
+        handle_telegram_message(token, message)
+    return "", 200
+
+
+def call_in_app_context(fn, *args):
     with app.app_context():
+        return fn(*args)
+
+
+async def telegram_poll_loop():
+    loop = asyncio.get_running_loop()
+
+    async def call(fn, *args):
+        return await loop.run_in_executor(None, call_in_app_context, fn, *args)
+
+    async with aiohttp.ClientSession() as http:
         while True:
-            enabled = get_config("telegram_enabled", "0") == "1"
-            token = get_config("telegram_bot_token", "").strip()
+            enabled = await call(get_config, "telegram_enabled", "0") == "1"
+            token = (await call(get_config, "telegram_bot_token", "")).strip()
             if not enabled or not token:
-                time.sleep(3)
+                await asyncio.sleep(3)
+                continue
+
+            # Webhook 模式下由 Telegram 主动推送，getUpdates 与 webhook 互斥。
+            if (await call(get_config, "telegram_webhook_url", "")).strip():
+                await asyncio.sleep(3)
                 continue
 
             try:
-                poll_interval = int(get_config("telegram_poll_interval", str(DEFAULT_TELEGRAM_POLL_INTERVAL)))
+                poll_interval = int(
+                    await call(get_config, "telegram_poll_interval", str(DEFAULT_TELEGRAM_POLL_INTERVAL))
+                )
             except ValueError:
                 poll_interval = DEFAULT_TELEGRAM_POLL_INTERVAL
             poll_interval = max(2, poll_interval)
 
             try:
-                last_update_id = int(get_config("telegram_last_update_id", "0"))
+                last_update_id = int(await call(get_config, "telegram_last_update_id", "0"))
             except ValueError:
                 last_update_id = 0
 
             try:
-                resp = telegram_api_get(
-                    token,
-                    "getUpdates",
-                    {
+                async with http.get(
+                    telegram_api_url(token, "getUpdates"),
+                    params={
                         "timeout": 20,
                         "offset": last_update_id + 1,
-                        "allowed_updates": ["message"],
+                        "allowed_updates": '["message"]',
                     },
-                )
-                data = resp.json()
-            except (requests.RequestException, ValueError):
-                time.sleep(poll_interval)
+                    timeout=aiohttp.ClientTimeout(total=30),
+                ) as resp:
+                    data = json_loads(await resp.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                await asyncio.sleep(poll_interval)
                 continue
 
             if not data.get("ok"):
-                time.sleep(poll_interval)
+                await asyncio.sleep(poll_interval)
                 continue
 
+            max_update_id = None
             for update in data.get("result", []):
                 update_id = update.get("update_id")
                 message = update.get("message")
-                if isinstance(update_id, int):
-                    set_config("telegram_last_update_id", str(update_id))
+                if isinstance(update_id, int) and (
+                    max_update_id is None or update_id > max_update_id
+                ):
+                    max_update_id = update_id
                 if message:
-                    handle_telegram_message(token, message)
+                    await call(handle_telegram_message, token, message)
+            if max_update_id is not None:
+                await call(set_config, "telegram_last_update_id", str(max_update_id))
+
+
+def run_telegram_poller():
+    asyncio.run(telegram_poll_loop())
 
 
 def start_telegram_poller():
@@ -612,14 +801,12 @@ def start_telegram_poller():
     with telegram_lock:
         if telegram_thread and telegram_thread.is_alive():
             return
-        telegram_thread = threading.Thread(target=telegram_poll_loop, daemon=True, name="telegram-poller")
+        telegram_thread = threading.Thread(target=run_telegram_poller, daemon=True, name="telegram-poller")
         telegram_thread.start()
 
 
 with app.app_context():
     init_db()
-    if not get_config("telegram_poll_interval", ""):
-        set_config("telegram_poll_interval", str(DEFAULT_TELEGRAM_POLL_INTERVAL))
 start_telegram_poller()
 
 